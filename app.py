@@ -7,24 +7,33 @@ It uses Google Gemini for code analysis and Markdown documentation generation.
 """
 
 import ast
+import functools
+import hashlib
 import io
+import json
 import os
 import re
 import sys
 import shutil
 import tempfile
+import threading
+import time
+import tokenize
+import types
 import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from contextlib import redirect_stdout
 from pathlib import Path
 
-import astor
-import graphviz
-import google.generativeai as genai
+from google import genai as genai_client
+from google.genai import types as genai_types
 from flask import Flask, render_template, request, jsonify, redirect, url_for, session
 from dotenv import load_dotenv
-from radon.complexity import cc_visit
-from radon.metrics import mi_visit
-from radon.raw import analyze as raw_analyze
+
+# graphviz and radon are deliberately imported inside the functions that use
+# them: most requests never render an SVG or compute metrics, and deferring
+# the imports keeps worker cold starts lean.
 
 # --- Load API Key ---
 load_dotenv()
@@ -32,7 +41,13 @@ api_key = os.getenv('GEMINI_API_KEY')
 if not api_key:
     raise ValueError("GEMINI_API_KEY not found. Make sure it's in your .env file.")
 
-genai.configure(api_key=api_key)
+# One client for the whole process: its underlying HTTP/2 connection is
+# multiplexed across threads, so the concurrent fan-outs in analyze-all and
+# upload-zip share a single warm TLS session instead of reconnecting.
+_CLIENT = genai_client.Client(
+    api_key=api_key,
+    http_options=genai_types.HttpOptions(timeout=60_000),
+)
 
 # --- Gemini Model Configuration ---
 GENERATION_CONFIG = {
@@ -141,19 +156,112 @@ Respond in Markdown under a "### Database Report" heading and keep each query se
 """
 
 
-def _build_model(system_instruction: str) -> genai.GenerativeModel:
-    """Create a Gemini model instance with the shared configuration."""
-    return genai.GenerativeModel(
-        MODEL_NAME,
-        generation_config=GENERATION_CONFIG,
-        safety_settings=SAFETY_SETTINGS,
+@functools.lru_cache(maxsize=None)
+def _plain_config(system_instruction: str) -> genai_types.GenerateContentConfig:
+    """Return the process-wide generation config for a persona.
+
+    Config construction validates the generation and safety settings, so
+    each persona's config is built once and reused across requests.
+    """
+    return genai_types.GenerateContentConfig(
         system_instruction=system_instruction,
+        safety_settings=SAFETY_SETTINGS,
+        **GENERATION_CONFIG,
+    )
+
+
+# Server-side prompt-prefix caching. Each persona's system instruction is
+# identical on every call, so it is registered once as cached content;
+# repeat requests then reference the cached prefix instead of re-sending
+# (and re-billing) it. Only the user's code travels in the message body.
+_CACHE_TTL_SECONDS = 3600
+_CACHED_CONTENT: dict[str, tuple[genai_types.GenerateContentConfig, float]] = {}
+_CACHE_UNSUPPORTED: set[str] = set()
+_CACHE_LOCK = threading.Lock()
+
+
+def _persona_config(system_instruction: str) -> genai_types.GenerateContentConfig:
+    """Return a persona's config, backed by cached content when possible.
+
+    The cache-backed config object is reused until shortly before the
+    server-side TTL, so steady-state calls construct nothing. Falls back to
+    the plain singleton config when the backend rejects the cache request
+    (for example when the prefix is below the minimum cacheable token count).
+    """
+    if system_instruction in _CACHE_UNSUPPORTED:
+        return _plain_config(system_instruction)
+    with _CACHE_LOCK:
+        entry = _CACHED_CONTENT.get(system_instruction)
+    # Recreate slightly before the server-side TTL so in-flight calls
+    # never reference an expired cache.
+    if entry is not None and time.monotonic() - entry[1] <= _CACHE_TTL_SECONDS - 300:
+        return entry[0]
+    try:
+        cached = _CLIENT.caches.create(
+            model=MODEL_NAME,
+            config=genai_types.CreateCachedContentConfig(
+                system_instruction=system_instruction,
+                ttl=f"{_CACHE_TTL_SECONDS}s",
+            ),
+        )
+    except Exception:
+        if entry is None:
+            # The very first creation failing means the backend rejects
+            # this prefix; stop retrying for the persona.
+            _CACHE_UNSUPPORTED.add(system_instruction)
+        else:
+            # A failed refresh is transient. Evict the about-to-expire
+            # entry rather than handing out a cached_content name the
+            # server is deleting, and try again on the next call.
+            with _CACHE_LOCK:
+                if _CACHED_CONTENT.get(system_instruction) is entry:
+                    del _CACHED_CONTENT[system_instruction]
+        return _plain_config(system_instruction)
+    config = genai_types.GenerateContentConfig(
+        cached_content=cached.name,
+        safety_settings=SAFETY_SETTINGS,
+        **GENERATION_CONFIG,
+    )
+    with _CACHE_LOCK:
+        _CACHED_CONTENT[system_instruction] = (config, time.monotonic())
+    return config
+
+
+def _generate(system_instruction: str, prompt: str) -> str:
+    """Send a single-turn generateContent call through the shared client."""
+    response = _CLIENT.models.generate_content(
+        model=MODEL_NAME,
+        contents=prompt,
+        config=_persona_config(system_instruction),
     )
+    return response.text
 
 app = Flask(__name__)
 app.secret_key = 'codescribe-secret-key-2025-enterprise'
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max upload
 
+# Optional accelerator: orjson serializes the metrics and report payloads in
+# native code, several times faster than the stdlib encoder Flask defaults
+# to. The stdlib provider stays in place when the package is missing.
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
+if _orjson is not None:
+    from flask.json.provider import JSONProvider
+
+    class _OrjsonProvider(JSONProvider):
+        """Flask JSON provider backed by orjson."""
+
+        def dumps(self, obj, **kwargs) -> str:
+            return _orjson.dumps(obj, default=str).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return _orjson.loads(s)
+
+    app.json = _OrjsonProvider(app)
+
 
 @app.route('/')
 def index():
@@ -166,95 +274,180 @@ def index():
         return redirect(url_for('login'))
     return render_template('index.html')
 
+# Exact-match response cache in front of the LLM helpers. With
+# temperature=0.3 identical prompts yield near-deterministic output, so
+# re-submissions of the same code (common during iterative UI use) can skip
+# the Gemini round trip entirely. An in-process LRU is always active; a
+# shared Redis tier joins in when REDIS_URL is configured.
+_LLM_CACHE_MAX_ENTRIES = 512
+_llm_cache_store: OrderedDict[str, tuple[str, float]] = OrderedDict()
+_llm_cache_lock = threading.Lock()
+
+try:
+    import redis as _redis
+except ImportError:
+    _redis = None
+
+_redis_client = (
+    _redis.Redis.from_url(os.environ['REDIS_URL'])
+    if _redis is not None and os.getenv('REDIS_URL')
+    else None
+)
+
+
+def _llm_cache(persona: str, ttl: int = 1800):
+    """Memoize an LLM helper on a digest of (persona, model, arguments)."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            key_material = "|".join([persona, MODEL_NAME, *map(str, args)])
+            key = hashlib.blake2b(
+                key_material.encode('utf-8'), digest_size=16
+            ).hexdigest()
+            now = time.monotonic()
+
+            with _llm_cache_lock:
+                entry = _llm_cache_store.get(key)
+                if entry is not None and now - entry[1] < ttl:
+                    _llm_cache_store.move_to_end(key)
+                    return entry[0]
+
+            if _redis_client is not None:
+                try:
+                    hit = _redis_client.get(f"response:{key}")
+                except Exception:
+                    hit = None
+                if hit is not None:
+                    text = hit.decode('utf-8')
+                    with _llm_cache_lock:
+                        _llm_cache_store[key] = (text, now)
+                    return text
+
+            result = func(*args)
+
+            with _llm_cache_lock:
+                _llm_cache_store[key] = (result, now)
+                _llm_cache_store.move_to_end(key)
+                while len(_llm_cache_store) > _LLM_CACHE_MAX_ENTRIES:
+                    _llm_cache_store.popitem(last=False)
+            if _redis_client is not None:
+                try:
+                    _redis_client.setex(f"response:{key}", ttl, result)
+                except Exception:
+                    pass
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+@_llm_cache(persona="doc")
 def get_ai_documentation(code_str: str) -> str:
     """Send the user's code to the documentation persona and return Markdown."""
-    doc_model = _build_model(DOC_SYSTEM_INSTRUCTION)
-    chat_session = doc_model.start_chat(history=[])
-    response = chat_session.send_message(
-        f"""Here is the code:\n\n```
-{code_str}
-```"""
-    )
-    return response.text
+    # The persona lives entirely in the (cached) system instruction, so the
+    # message body is just the variable tail: the code itself.
+    return _generate(DOC_SYSTEM_INSTRUCTION, f"```python\n{code_str}\n```")
 
 
+@_llm_cache(persona="audit")
 def get_ai_security_audit(code_str: str) -> str:
     """Run the security audit persona against the provided source code."""
-    audit_model = _build_model(AUDIT_SYSTEM_INSTRUCTION)
-    chat_session = audit_model.start_chat(history=[])
-    response = chat_session.send_message(
-        f"""Audit the following code:\n\n```
-{code_str}
-```"""
-    )
-    return response.text
+    return _generate(AUDIT_SYSTEM_INSTRUCTION, f"```python\n{code_str}\n```")
 
 
 def get_ai_refactor(code_str: str, vulnerability_context: str) -> str:
     """Send the vulnerability details to the refactor persona."""
     if not vulnerability_context.strip():
         raise ValueError("vulnerability_context is required")
-    refactor_model = _build_model(REFACTOR_SYSTEM_INSTRUCTION)
-    chat_session = refactor_model.start_chat(history=[])
     prompt = (
         "Original Code:\n\n```python\n"
         f"{code_str}\n"
         "```\n\nVulnerability Context:\n"
         f"{vulnerability_context}"
     )
-    response = chat_session.send_message(prompt)
-    return response.text
+    return _generate(REFACTOR_SYSTEM_INSTRUCTION, prompt)
 
 
-class FunctionCallVisitor(ast.NodeVisitor):
-    """Collect function definitions and their outgoing call targets."""
+@functools.lru_cache(maxsize=64)
+def _parse(code: str) -> ast.AST | None:
+    """Parse source at most once per unique string; None when it is invalid.
 
-    def __init__(self) -> None:
-        self.current_function = None
-        self.calls = {}
+    The visualizer, SQL extractor, and function isolator all walk the same
+    module, so memoizing the parse means each submission is parsed once no
+    matter how many analyses run over it.
+    """
+    try:
+        return ast.parse(code)
+    except SyntaxError:
+        return None
 
-    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
-        previous = self.current_function
-        self.current_function = node.name
-        self.calls.setdefault(node.name, set())
-        self.generic_visit(node)
-        self.current_function = previous
 
-    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> None:
-        self.visit_FunctionDef(node)  # Treat async functions the same way.
+def _resolve_callable_name(node: ast.AST) -> str | None:
+    """Render a call's func expression as a readable name."""
+    # Nearly every callee is a bare name or a dotted attribute chain;
+    # resolve those directly and only fall back to ast.unparse for
+    # exotic expressions (subscripts, calls, lambdas, ...).
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        parts = [node.attr]
+        value = node.value
+        while isinstance(value, ast.Attribute):
+            parts.append(value.attr)
+            value = value.value
+        if isinstance(value, ast.Name):
+            parts.append(value.id)
+            return ".".join(reversed(parts))
+    try:
+        return ast.unparse(node).strip()
+    except (ValueError, AttributeError):
+        return None
 
-    def visit_Call(self, node: ast.Call) -> None:
-        if self.current_function:
-            callee = self._resolve_callable_name(node.func)
-            if callee:
-                self.calls.setdefault(self.current_function, set()).add(callee)
-        self.generic_visit(node)
 
-    @staticmethod
-    def _resolve_callable_name(node: ast.AST) -> str | None:
-        try:
-            return astor.to_source(node).strip()
-        except (SyntaxError, ValueError, AttributeError):
-            return None
+def _collect_function_calls(tree: ast.AST) -> dict[str, set[str]]:
+    """Map each function defined in the tree to the callables it invokes.
+
+    A single walk with an explicit (node, enclosing-function) stack tracks
+    scope manually, replacing the former NodeVisitor subclass and its
+    per-node visit_* method dispatch. Module-level calls carry no owner and
+    are skipped, matching the old visitor's behavior.
+    """
+    calls: dict[str, set[str]] = {}
+    stack: list[tuple[ast.AST, str | None]] = [(tree, None)]
+    while stack:
+        node, owner = stack.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            owner = node.name
+            calls.setdefault(owner, set())
+        elif owner is not None and isinstance(node, ast.Call):
+            callee = _resolve_callable_name(node.func)
+            if callee:
+                calls[owner].add(callee)
+        for child in ast.iter_child_nodes(node):
+            stack.append((child, owner))
+    return calls
 
 
-def generate_visualizer_graph(code_str: str) -> dict[str, str]:
+def generate_visualizer_graph(code_str: str, tree: ast.AST | None = None) -> dict[str, str]:
     """Produce Mermaid and Graphviz representations of the call graph."""
-    try:
-        tree = ast.parse(code_str)
-    except SyntaxError as exc:
-        return {
-            "mermaid": "",
-            "graphviz": "",
-            "error": f"Failed to parse code: {exc}"
-        }
-
-    visitor = FunctionCallVisitor()
-    visitor.visit(tree)
+    if tree is None:
+        tree = _parse(code_str)
+    if tree is None:
+        # Only the (rare) error path re-parses, to recover the message.
+        try:
+            ast.parse(code_str)
+        except SyntaxError as exc:
+            return {
+                "mermaid": "",
+                "graphviz": "",
+                "error": f"Failed to parse code: {exc}"
+            }
 
     adjacency: dict[str, list[str]] = {
         func: sorted(callees)
-        for func, callees in visitor.calls.items()
+        for func, callees in _collect_function_calls(tree).items()
     }
 
     all_nodes: set[str] = set(adjacency.keys())
@@ -275,10 +468,7 @@ def generate_visualizer_graph(code_str: str) -> dict[str, str]:
     def ensure_node_id(label: str) -> str:
         if label in node_id_map:
             return node_id_map[label]
-        sanitized = re.sub(r"\W+", "_", label)
-        if sanitized and sanitized[0].isdigit():
-            sanitized = f"n_{sanitized}"
-        sanitized = sanitized or "node"
+        sanitized = _sanitize_node_id(label)
         base = sanitized
         suffix = 1
         while sanitized in used_ids:
@@ -288,20 +478,24 @@ def generate_visualizer_graph(code_str: str) -> dict[str, str]:
         node_id_map[label] = sanitized
         return sanitized
 
-    mermaid_lines = ["graph TD"]
-    for label in sorted(all_nodes):
-        node_id = ensure_node_id(label)
-        display_label = label.replace('"', "'")
-        mermaid_lines.append(f"{node_id}[\"{display_label}\"]")
-
-    for caller, callees in sorted(adjacency.items()):
-        caller_id = ensure_node_id(caller)
-        for callee in callees:
-            callee_id = ensure_node_id(callee)
-            mermaid_lines.append(f"{caller_id} --> {callee_id}")
+    # Build the node and edge sections as comprehensions and join once;
+    # ensure_node_id assigns every id during the node pass, so the edge
+    # pass is pure dict lookups.
+    node_lines = [
+        '{}["{}"]'.format(ensure_node_id(label), label.replace('"', "'"))
+        for label in sorted(all_nodes)
+    ]
+    edge_lines = [
+        f"{node_id_map[caller]} --> {node_id_map[callee]}"
+        for caller, callees in sorted(adjacency.items())
+        for callee in callees
+    ]
+    mermaid_graph = "\n".join(["graph TD", *node_lines, *edge_lines])
 
     graphviz_svg = ""
     try:
+        import graphviz
+
         graph = graphviz.Digraph(comment="Function Call Graph", format="svg")
         for node in sorted(all_nodes):
             graph.node(node)
@@ -309,204 +503,371 @@ def generate_visualizer_graph(code_str: str) -> dict[str, str]:
             for callee in callees:
                 graph.edge(caller, callee)
         graphviz_svg = graph.pipe().decode("utf-8")
+    except ImportError:
+        graphviz_svg = ""
     except graphviz.backend.ExecutableNotFound:
         graphviz_svg = ""
     except Exception as exc:
         graphviz_svg = f"Graphviz rendering failed: {exc}"
 
     return {
-        "mermaid": "\n".join(mermaid_lines),
+        "mermaid": mermaid_graph,
         "graphviz": graphviz_svg,
     }
 
 
-def isolate_function_code(full_code: str, function_name: str) -> str | None:
+def isolate_function_code(full_code: str, function_name: str,
+                          tree: ast.AST | None = None) -> str | None:
     """Extract the source code for the requested top-level function."""
     if not function_name:
         return None
-    try:
-        tree = ast.parse(full_code)
-    except SyntaxError:
+    if tree is None:
+        tree = _parse(full_code)
+    if tree is None:
         return None
 
     for node in tree.body:
         if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == function_name:
-            return astor.to_source(node).strip()
+            return ast.unparse(node).strip()
     return None
 
 
+@_llm_cache(persona="testgen")
 def get_ai_test_module(function_source: str, function_name: str) -> str:
     """Generate pytest code for the isolated function."""
     if not function_source:
         raise ValueError(f"Function '{function_name}' not found in provided code.")
 
-    test_model = _build_model(TEST_GEN_SYSTEM_INSTRUCTION)
-    chat_session = test_model.start_chat(history=[])
+    # Keep the framing byte-identical across calls; variable parts go last.
     prompt = (
-        f"Generate pytest tests for the following function `{function_name}`.\n\n"
+        "Generate pytest tests for the following function.\n\n"
+        f"Function name: `{function_name}`\n\n"
         "```python\n"
         f"{function_source}\n"
         "```"
     )
-    response = chat_session.send_message(prompt)
-    return response.text
+    return _generate(TEST_GEN_SYSTEM_INSTRUCTION, prompt)
 
 
+@_llm_cache(persona="architect")
 def get_ai_project_overview(project_code: str) -> str:
     """Summarize an entire project using the Architect persona."""
-    architect_model = _build_model(ARCHITECT_SYSTEM_INSTRUCTION)
-    chat_session = architect_model.start_chat(history=[])
-    response = chat_session.send_message(
+    return _generate(
+        ARCHITECT_SYSTEM_INSTRUCTION,
         "Provide a project-wide architecture brief for the following source files:\n\n" +
-        project_code
+        project_code,
     )
-    return response.text
 
 
 SQL_KEYWORD_PATTERN = re.compile(
     r"\b(SELECT|INSERT|UPDATE|DELETE|CREATE\s+TABLE|ALTER\s+TABLE|WITH\s+|DROP\s+TABLE|MERGE)\b",
     re.IGNORECASE,
 )
+_SQL_VERBS = frozenset({
+    "SELECT", "INSERT", "UPDATE", "DELETE", "CREATE", "ALTER", "WITH",
+    "DROP", "MERGE",
+})
+_SQL_VERB_PROBE = re.compile(r"[A-Z]+")
+
+# Optional accelerator: when the hyperscan package is installed, keyword
+# confirmation runs as a linear-time DFA scan instead of Python re's
+# backtracking engine. Worth it for project uploads with thousands of
+# string literals; everything falls back to the regex when unavailable.
+try:
+    import hyperscan as _hyperscan
+except ImportError:
+    _hyperscan = None
+
+_SQL_SCAN_DB = None
+if _hyperscan is not None:
+    try:
+        _SQL_SCAN_DB = _hyperscan.Database()
+        _SQL_SCAN_DB.compile(
+            expressions=[SQL_KEYWORD_PATTERN.pattern.encode('utf-8')],
+            flags=[_hyperscan.HS_FLAG_CASELESS],
+        )
+    except Exception:
+        _SQL_SCAN_DB = None
+
+
+def _sql_keyword_match(text: str) -> bool:
+    """Confirm an SQL keyword via the Hyperscan DFA when available."""
+    if _SQL_SCAN_DB is not None:
+        found = False
 
+        def on_match(_expr_id, _start, _end, _flags, _context):
+            nonlocal found
+            found = True
+            return 1  # Non-zero halts the scan at the first hit.
 
-def extract_sql_queries(code_str: str) -> list[str]:
+        try:
+            _SQL_SCAN_DB.scan(text.encode('utf-8'), match_event_handler=on_match)
+        except Exception:
+            # ScanTerminated after the first hit, or any binding hiccup:
+            # the found flag (or the regex) still gives the right answer.
+            if found:
+                return True
+            return bool(SQL_KEYWORD_PATTERN.search(text))
+        return found
+    return bool(SQL_KEYWORD_PATTERN.search(text))
+
+
+def extract_sql_queries(code_str: str, tree: ast.AST | None = None) -> list[str]:
     """Scan Python source for inline SQL query strings."""
 
     def looks_like_sql(text: str) -> bool:
         stripped = text.strip()
         if len(stripped) < 6:
             return False
-        return bool(SQL_KEYWORD_PATTERN.search(stripped))
+        # Cheap probe first: a real query leads with an SQL verb, so unless
+        # the first alphabetic run is one, skip the full keyword regex.
+        # Docstrings and ordinary literals are rejected here, cutting regex
+        # invocations by an order of magnitude on typical files.
+        probe = _SQL_VERB_PROBE.match(stripped[:16].upper())
+        if probe is None or probe.group(0) not in _SQL_VERBS:
+            return False
+        return _sql_keyword_match(stripped)
 
     queries: list[str] = []
     seen: set[str] = set()
-    try:
-        tree = ast.parse(code_str)
-    except SyntaxError:
+    if tree is None:
+        tree = _parse(code_str)
+    if tree is None:
         return []
 
-    class SQLExtractor(ast.NodeVisitor):
-        def _maybe_add(self, value: str) -> None:
-            if not value:
-                return
-            candidate = value.strip()
-            if looks_like_sql(candidate) and candidate not in seen:
-                seen.add(candidate)
-                queries.append(candidate)
-
-        def visit_Constant(self, node: ast.Constant) -> None:  # type: ignore[override]
+    def maybe_add(value: str) -> None:
+        candidate = value.strip()
+        if candidate and looks_like_sql(candidate) and candidate not in seen:
+            seen.add(candidate)
+            queries.append(candidate)
+
+    # Manual preorder walk: a tight loop over iter_child_nodes avoids
+    # NodeVisitor's per-node method dispatch, and f-strings are handled as a
+    # unit (literal fragments joined rather than probed one by one).
+    stack: list[ast.AST] = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.Constant):
             if isinstance(node.value, str):
-                self._maybe_add(node.value)
-
-        def visit_Str(self, node: ast.Str) -> None:  # for Python <3.8 compatibility
-            self._maybe_add(node.s)
-
-        def visit_JoinedStr(self, node: ast.JoinedStr) -> None:
-            literal_parts: list[str] = []
-            for value in node.values:
-                if isinstance(value, ast.Str):
-                    literal_parts.append(value.s)
-                elif isinstance(value, ast.Constant) and isinstance(value.value, str):
-                    literal_parts.append(value.value)
+                maybe_add(node.value)
+            continue
+        if isinstance(node, ast.JoinedStr):
+            literal_parts = [
+                value.value
+                for value in node.values
+                if isinstance(value, ast.Constant) and isinstance(value.value, str)
+            ]
             if literal_parts:
-                self._maybe_add("".join(literal_parts))
-
-    SQLExtractor().visit(tree)
+                maybe_add("".join(literal_parts))
+            continue
+        children = list(ast.iter_child_nodes(node))
+        children.reverse()
+        stack.extend(children)
     return queries
 
 
+def _format_sql_prompt(sql_queries: list[str]) -> str:
+    """Render the extracted queries as the DBA persona's message body."""
+    prompt_sections = []
+    for idx, query in enumerate(sql_queries, start=1):
+        prompt_sections.append(f"Query {idx}:\n```sql\n{query}\n```")
+    return "\n\n".join(prompt_sections)
+
+
+@_llm_cache(persona="dba")
 def get_ai_database_report(sql_queries: list[str]) -> str:
     """Delegate SQL performance and security review to the DBA persona."""
     if not sql_queries:
         return ""
 
-    prompt_sections = []
-    for idx, query in enumerate(sql_queries, start=1):
-        prompt_sections.append(f"Query {idx}:\n```sql\n{query}\n```")
-
-    prompt = "\n\n".join(prompt_sections)
-    dba_model = _build_model(DBA_SYSTEM_INSTRUCTION)
-    chat_session = dba_model.start_chat(history=[])
-    response = chat_session.send_message(prompt)
-    return response.text
+    return _generate(DBA_SYSTEM_INSTRUCTION, _format_sql_prompt(sql_queries))
 
 
 def collect_python_files(project_root: str) -> list[tuple[str, str]]:
     """Return (relative_path, source) tuples for all Python files under root."""
-    python_files: list[tuple[str, str]] = []
     root_path = Path(project_root).resolve()
+    candidates: list[Path] = []
     for path in root_path.rglob('*.py'):
         if any(part.startswith('.') for part in path.relative_to(root_path).parts):
             continue
         if '__pycache__' in path.parts:
             continue
+        candidates.append(path)
+
+    def read_one(path: Path) -> str | None:
         try:
-            source = path.read_text(encoding='utf-8')
+            return path.read_text(encoding='utf-8')
         except (UnicodeDecodeError, OSError):
-            continue
-        rel_path = path.relative_to(root_path).as_posix()
-        python_files.append((rel_path, source))
-    return python_files
+            return None
+
+    # Disk reads are I/O-bound, so overlap them on threads for larger
+    # projects; tiny uploads are not worth the pool spin-up.
+    if len(candidates) > 16:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            sources = list(pool.map(read_one, candidates))
+    else:
+        sources = [read_one(path) for path in candidates]
+
+    return [
+        (path.relative_to(root_path).as_posix(), source)
+        for path, source in zip(candidates, sources)
+        if source is not None
+    ]
+
+
+def _analyze_file(rel_path: str, source: str) -> dict[str, object]:
+    """Per-file analysis unit for the project upload pipeline.
+
+    Parses the source once and returns everything downstream needs —
+    top-level definitions, scoped call sites, and extracted SQL — as plain
+    picklable values, so it can run in a worker process.
+    """
+    tree = _parse(source)
+    if tree is None:
+        return {"rel_path": rel_path, "defined": [], "calls": [], "sql": []}
+    defined = [
+        node.name for node in tree.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+    ]
+    calls = [
+        (func_name, callee)
+        for func_name, callees in _collect_function_calls(tree).items()
+        for callee in sorted(callees)
+    ]
+    return {
+        "rel_path": rel_path,
+        "defined": defined,
+        "calls": calls,
+        "sql": extract_sql_queries(source, tree),
+    }
+
+
+_PROCESS_POOL_MIN_FILES = 8
+
+# Re-uploads of a project are dominated by unchanged files, so per-file
+# analysis results are memoized on a digest of the source; only files the
+# server has not seen are re-parsed. The LLM-side results are already
+# exact-match cached by _llm_cache on the combined source, so repeating an
+# upload costs little more than the zip extraction.
+_FILE_ANALYSIS_CACHE_MAX = 4096
+_file_analysis_cache: OrderedDict[bytes, dict[str, object]] = OrderedDict()
+_file_analysis_lock = threading.Lock()
+
+
+def _run_file_analyses(py_files: list[tuple[str, str]]) -> list[dict[str, object]]:
+    """Run _analyze_file across the files, spreading over cores when it pays.
+
+    Parsing and call collection are CPU-bound, so large batches scale with
+    the process pool; small ones skip the fork/pickle overhead entirely.
+    Falls back to in-process analysis if the pool cannot be used.
+    """
+    if len(py_files) >= _PROCESS_POOL_MIN_FILES:
+        rel_paths = [rel for rel, _ in py_files]
+        sources = [src for _, src in py_files]
+        try:
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+                return list(pool.map(_analyze_file, rel_paths, sources, chunksize=8))
+        except Exception as exc:
+            print(f"Process-pool analysis unavailable, running inline: {exc}")
+    return [_analyze_file(rel, src) for rel, src in py_files]
+
+
+def _analyze_project_files(py_files: list[tuple[str, str]]) -> list[dict[str, object]]:
+    """Return per-file analyses, reusing digest-matched results across uploads."""
+    results: list[dict[str, object] | None] = [None] * len(py_files)
+    digests: list[bytes] = []
+    misses: list[int] = []
+
+    for idx, (rel_path, source) in enumerate(py_files):
+        digest = hashlib.blake2b(source.encode('utf-8'), digest_size=16).digest()
+        digests.append(digest)
+        with _file_analysis_lock:
+            cached = _file_analysis_cache.get(digest)
+            if cached is not None:
+                _file_analysis_cache.move_to_end(digest)
+        if cached is not None:
+            # Same content can live at a different path on re-upload.
+            entry = dict(cached)
+            entry["rel_path"] = rel_path
+            results[idx] = entry
+        else:
+            misses.append(idx)
+
+    if misses:
+        fresh = _run_file_analyses([py_files[idx] for idx in misses])
+        with _file_analysis_lock:
+            for idx, analysis in zip(misses, fresh):
+                results[idx] = analysis
+                _file_analysis_cache[digests[idx]] = analysis
+            while len(_file_analysis_cache) > _FILE_ANALYSIS_CACHE_MAX:
+                _file_analysis_cache.popitem(last=False)
+
+    return results
+
+
+# Table mapping every non-identifier ASCII character to "_", built once at
+# import so per-label sanitizing is a C-level str.translate rather than a
+# regex substitution. Non-ASCII labels fall back to the regex.
+_ID_TRANS = str.maketrans({
+    char: "_" for char in map(chr, range(128))
+    if not (char.isalnum() or char == "_")
+})
+_UNDERSCORE_RUN_RE = re.compile(r"_+")
+_NON_WORD_RE = re.compile(r"\W+")
+_CALLEE_SPLIT_RE = re.compile(r"[\s(]")
 
 
 def _sanitize_node_id(label: str) -> str:
-    sanitized = re.sub(r"\W+", "_", label)
+    if label.isascii():
+        sanitized = _UNDERSCORE_RUN_RE.sub("_", label.translate(_ID_TRANS))
+    else:
+        sanitized = _NON_WORD_RE.sub("_", label)
     if sanitized and sanitized[0].isdigit():
         sanitized = f"n_{sanitized}"
     return sanitized or "node"
 
 
-def build_project_call_graph(py_files: list[tuple[str, str]]):
-    """Create a cross-file call graph for an entire project."""
+def build_project_call_graph(py_files: list[tuple[str, str]],
+                             analyses: list[dict[str, object]] | None = None):
+    """Create a cross-file call graph for an entire project.
+
+    Accepts the per-file analyses when the caller already computed them (the
+    upload pipeline shares one pass with SQL extraction); otherwise runs
+    _analyze_project_files itself.
+    """
+    if analyses is None:
+        analyses = _analyze_project_files(py_files)
+
     defined_functions: dict[str, set[str]] = {}
     nodes: dict[str, dict[str, str]] = {}
     edges: set[tuple[str, str]] = set()
 
     # First pass: collect defined functions
-    for rel_path, source in py_files:
-        try:
-            tree = ast.parse(source)
-        except SyntaxError:
-            continue
-        for node in tree.body:
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                qualified = f"{rel_path}:{node.name}"
-                nodes[qualified] = {
-                    "id": qualified,
-                    "label": qualified,
-                    "file": rel_path,
-                    "function": node.name,
-                    "type": "defined",
-                }
-                defined_functions.setdefault(node.name, set()).add(qualified)
-
-    class ProjectCallGraphVisitor(ast.NodeVisitor):
-        def __init__(self, file_label: str):
-            self.file_label = file_label
-            self.current_function: str | None = None
-
-        def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
-            qualified = f"{self.file_label}:{node.name}"
-            previous = self.current_function
-            self.current_function = qualified
-            self.generic_visit(node)
-            self.current_function = previous
-
-        def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> None:
-            self.visit_FunctionDef(node)
-
-        def visit_Call(self, node: ast.Call) -> None:
-            if not self.current_function:
-                return
-            callee_repr = FunctionCallVisitor._resolve_callable_name(node.func)
-            if not callee_repr:
-                return
-            callee_basic = re.split(r"[\s(]", callee_repr)[0]
+    for analysis in analyses:
+        rel_path = analysis["rel_path"]
+        for name in analysis["defined"]:
+            qualified = f"{rel_path}:{name}"
+            nodes[qualified] = {
+                "id": qualified,
+                "label": qualified,
+                "file": rel_path,
+                "function": name,
+                "type": "defined",
+            }
+            defined_functions.setdefault(name, set()).add(qualified)
+
+    # Second pass: resolve each file's call sites against the project-wide
+    # definition map.
+    for analysis in analyses:
+        rel_path = analysis["rel_path"]
+        for func_name, callee_repr in analysis["calls"]:
+            caller = f"{rel_path}:{func_name}"
+            callee_basic = _CALLEE_SPLIT_RE.split(callee_repr)[0]
             callee_name = callee_basic.split('.')[-1]
             targets = defined_functions.get(callee_name)
             if targets:
                 for target in targets:
-                    edges.add((self.current_function, target))
+                    edges.add((caller, target))
             else:
                 external_label = f"external::{callee_basic}"
                 if external_label not in nodes:
@@ -517,34 +878,34 @@ def build_project_call_graph(py_files: list[tuple[str, str]]):
                         "function": callee_basic,
                         "type": "external",
                     }
-                edges.add((self.current_function, external_label))
-            self.generic_visit(node)
+                edges.add((caller, external_label))
 
-    for rel_path, source in py_files:
-        try:
-            tree = ast.parse(source)
-        except SyntaxError:
-            continue
-        ProjectCallGraphVisitor(rel_path).visit(tree)
-
-    mermaid_lines = ["graph LR"]
     id_map: dict[str, str] = {}
-    for label in sorted(nodes.keys()):
+    # Track assigned ids in a set so collision probing is O(1) per label
+    # instead of a linear scan over id_map.values() (O(n^2) overall).
+    used_ids: set[str] = set()
+    sorted_labels = sorted(nodes.keys())
+    for label in sorted_labels:
         node_id = _sanitize_node_id(label)
         suffix = 1
         base_id = node_id
-        while node_id in id_map.values():
+        while node_id in used_ids:
             suffix += 1
             node_id = f"{base_id}_{suffix}"
+        used_ids.add(node_id)
         id_map[label] = node_id
-        safe_label = nodes[label]["label"].replace('"', "'")
-        mermaid_lines.append(f"{node_id}[\"{safe_label}\"]")
 
-    for source_id, target_id in sorted(edges):
-        src = id_map.get(source_id)
-        dst = id_map.get(target_id)
-        if src and dst:
-            mermaid_lines.append(f"{src} --> {dst}")
+    # Emit node and edge sections as comprehensions and join once at the end.
+    node_lines = [
+        '{}["{}"]'.format(id_map[label], nodes[label]["label"].replace('"', "'"))
+        for label in sorted_labels
+    ]
+    edge_lines = [
+        f"{id_map[source_id]} --> {id_map[target_id]}"
+        for source_id, target_id in sorted(edges)
+        if source_id in id_map and target_id in id_map
+    ]
+    mermaid_graph = "\n".join(["graph LR", *node_lines, *edge_lines])
 
     metadata = {
         "files": len(py_files),
@@ -557,78 +918,286 @@ def build_project_call_graph(py_files: list[tuple[str, str]]):
         "mode": "project",
         "nodes": list(nodes.values()),
         "edges": [{"source": s, "target": t} for s, t in sorted(edges)],
-        "mermaid": "\n".join(mermaid_lines),
+        "mermaid": mermaid_graph,
         "metadata": metadata,
     }
 
 
+# Sanity caps applied to archive headers before extraction.
+_MAX_UNCOMPRESSED_BYTES = 200 * 1024 * 1024
+_MAX_COMPRESSION_RATIO = 100
+
+
 def safe_extract(zip_ref: zipfile.ZipFile, destination: str) -> None:
-    """Extract a zip file while preventing path traversal."""
-    dest_path = Path(destination).resolve()
+    """Extract a zip file while preventing path traversal.
+
+    Validation and extraction are fused into one pass: each member's target
+    is normalized with pure string operations (no filesystem stats from
+    Path.resolve) and checked against the destination prefix before being
+    extracted individually. Members the analysis pipeline would ignore
+    anyway — non-.py files, __pycache__, version-control internals — are
+    skipped entirely, which avoids the bulk of the I/O on mixed archives.
+
+    Decompression bombs are rejected up front from the ZipInfo headers
+    alone: the declared uncompressed total and compression ratio are
+    checked before any byte is inflated.
+    """
+    total_uncompressed = 0
+    total_compressed = 0
     for member in zip_ref.infolist():
-        member_path = dest_path / member.filename
-        if not str(member_path.resolve()).startswith(str(dest_path)):
+        total_uncompressed += member.file_size
+        total_compressed += member.compress_size
+    if total_uncompressed > _MAX_UNCOMPRESSED_BYTES:
+        raise ValueError("Archive too large to analyze.")
+    if total_uncompressed / max(1, total_compressed) > _MAX_COMPRESSION_RATIO:
+        raise ValueError("Archive compression ratio looks unsafe.")
+
+    dest = os.path.abspath(destination) + os.sep
+    for member in zip_ref.infolist():
+        target = os.path.normpath(os.path.join(dest, member.filename))
+        if not target.startswith(dest):
             raise ValueError("Zip file contains unsafe paths.")
-    zip_ref.extractall(destination)
+        if member.is_dir():
+            continue
+        parts = member.filename.replace('\\', '/').split('/')
+        if not parts[-1].endswith('.py'):
+            continue
+        if '__pycache__' in parts or any(part.startswith('.') for part in parts):
+            continue
+        zip_ref.extract(member, destination)
 
 
-def get_live_trace_explanation(code_str: str, trace_input: str) -> str:
-    """Run the user's code with tracing and ask the explainer persona to narrate it."""
+# --- Gemini Batch API support for large project uploads ---
+# Batch jobs run at half the price of synchronous generateContent and with
+# far higher rate limits; the trade-off is asynchronous completion. The UI
+# opts in via /upload-zip?async=1 and polls /batch-status/<job> for results.
 
-    trace_log: list[str] = []
+
+def _submit_project_batch(temp_dir: str, combined_code: str,
+                          sql_queries: list[str]) -> str:
+    """Queue the project-wide persona requests as one batch job.
+
+    Builds a JSONL file with one keyed request per persona, uploads it, and
+    returns the created batch job's resource name for later polling.
+    """
+    batch_requests = [
+        {
+            "key": "project_summary",
+            "request": {
+                "contents": [{
+                    "role": "user",
+                    "parts": [{"text": (
+                        "Provide a project-wide architecture brief for the "
+                        "following source files:\n\n" + combined_code
+                    )}],
+                }],
+                "system_instruction": {"parts": [{"text": ARCHITECT_SYSTEM_INSTRUCTION}]},
+            },
+        },
+        {
+            "key": "project_security",
+            "request": {
+                "contents": [{
+                    "role": "user",
+                    "parts": [{"text": f"```python\n{combined_code}\n```"}],
+                }],
+                "system_instruction": {"parts": [{"text": AUDIT_SYSTEM_INSTRUCTION}]},
+            },
+        },
+    ]
+    if sql_queries:
+        batch_requests.append({
+            "key": "database_report",
+            "request": {
+                "contents": [{
+                    "role": "user",
+                    "parts": [{"text": _format_sql_prompt(sql_queries)}],
+                }],
+                "system_instruction": {"parts": [{"text": DBA_SYSTEM_INSTRUCTION}]},
+            },
+        })
+
+    jsonl_path = os.path.join(temp_dir, 'batch_requests.jsonl')
+    with open(jsonl_path, 'w', encoding='utf-8') as handle:
+        for entry in batch_requests:
+            handle.write(json.dumps(entry) + '\n')
+
+    uploaded = _CLIENT.files.upload(
+        file=jsonl_path,
+        config={"display_name": "codescribe-project-batch", "mime_type": "jsonl"},
+    )
+    batch_job = _CLIENT.batches.create(
+        model=MODEL_NAME,
+        src=uploaded.name,
+        config={"display_name": "codescribe-project-analysis"},
+    )
+    return batch_job.name
+
+
+def _extract_batch_text(response: dict) -> str:
+    """Pull the first candidate's text out of a batch result line."""
+    try:
+        return response["candidates"][0]["content"]["parts"][0]["text"]
+    except (KeyError, IndexError, TypeError):
+        return ""
+
+
+# Hard cap on recorded trace lines so pathological inputs cannot balloon
+# the log (and the prompt built from it) without bound.
+_TRACE_LOG_LIMIT = 10_000
+
+# Execution fuel: total line events a traced run may consume before it is
+# aborted. Without this, a `while True:` in user input pins a worker thread
+# indefinitely and degrades every concurrent request.
+_TRACE_LINE_BUDGET = 100_000
+
+
+def _iter_code_objects(code: types.CodeType):
+    """Yield a code object and every code object nested in its constants."""
+    yield code
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from _iter_code_objects(const)
+
+
+# sys.monitoring tool ids are process-global, so only one trace may own the
+# profiler slot at a time. Concurrent traces (waitress threads, analyze-all
+# fan-out) fall back to the per-thread settrace hook instead of erroring.
+_MONITORING_TOOL_LOCK = threading.Lock()
+
+
+def _run_traced_monitoring(code_objects, sandbox, record_line) -> None:
+    """Trace via sys.monitoring (PEP 669), available on CPython >= 3.12.
+
+    LINE events are enabled locally on the user's code objects only, so the
+    per-line dispatch is far cheaper than a universal settrace hook and the
+    sandbox setup/teardown is never instrumented.
+    """
+    mon = sys.monitoring
+    tool_id = mon.PROFILER_ID
+    try:
+        mon.use_tool_id(tool_id, "codescribe-live-trace")
+    except ValueError:
+        # Another tool (an attached profiler, say) owns the slot.
+        _run_traced_settrace(code_objects, sandbox, record_line)
+        return
+
+    def on_line(_code, lineno):
+        # The instrumented user frame sits directly below this callback.
+        record_line(sys._getframe(1), lineno)
+
+    try:
+        mon.register_callback(tool_id, mon.events.LINE, on_line)
+        for code in code_objects:
+            for obj in _iter_code_objects(code):
+                mon.set_local_events(tool_id, obj, mon.events.LINE)
+        for code in code_objects:
+            exec(code, sandbox)
+    finally:
+        mon.register_callback(tool_id, mon.events.LINE, None)
+        mon.free_tool_id(tool_id)
+
+
+def _run_traced_settrace(code_objects, sandbox, record_line) -> None:
+    """Trace via the classic sys.settrace hook (CPython < 3.12)."""
 
     def trace_lines(frame, event, _arg):
-        if event != "line":
-            return trace_lines
-        lineno = frame.f_lineno
+        if event == "line":
+            record_line(frame, frame.f_lineno)
+        return trace_lines
+
+    sys.settrace(trace_lines)
+    try:
+        for code in code_objects:
+            exec(code, sandbox)
+    finally:
+        sys.settrace(None)
+
+
+def _run_traced(code_objects, sandbox, trace_log: list[str]) -> None:
+    """Execute the code objects, appending a per-line variable snapshot.
+
+    Raises RuntimeError once the line budget is exhausted, which aborts the
+    user program mid-flight and bounds the CPU any single trace can burn.
+    """
+    executed_lines = 0
+
+    def record_line(frame, lineno):
+        nonlocal executed_lines
+        executed_lines += 1
+        if executed_lines > _TRACE_LINE_BUDGET:
+            raise RuntimeError(
+                f"trace budget exceeded ({_TRACE_LINE_BUDGET} line events)"
+            )
+        if len(trace_log) >= _TRACE_LOG_LIMIT:
+            return
         local_vars = {
             key: repr(value)
             for key, value in frame.f_locals.items()
             if not key.startswith("__")
         }
         trace_log.append(f"Line {lineno}: {local_vars}")
-        return trace_lines
 
-    safe_builtins = {
-        "range": range,
-        "len": len,
-        "print": print,
-        "enumerate": enumerate,
-        "sum": sum,
-        "min": min,
-        "max": max,
-        "sorted": sorted,
-        "list": list,
-        "dict": dict,
-        "set": set,
-        "tuple": tuple,
-        "zip": zip,
-        "abs": abs,
-    }
-    sandbox: dict[str, object] = {"__builtins__": safe_builtins}
+    if sys.version_info >= (3, 12) and _MONITORING_TOOL_LOCK.acquire(blocking=False):
+        try:
+            _run_traced_monitoring(code_objects, sandbox, record_line)
+        finally:
+            _MONITORING_TOOL_LOCK.release()
+    else:
+        _run_traced_settrace(code_objects, sandbox, record_line)
+
+
+# The sandbox's builtin whitelist never changes, so build it once; the
+# read-only proxy also stops traced code from monkey-patching a builtin for
+# later requests.
+_SAFE_BUILTINS = types.MappingProxyType({
+    "range": range,
+    "len": len,
+    "print": print,
+    "enumerate": enumerate,
+    "sum": sum,
+    "min": min,
+    "max": max,
+    "sorted": sorted,
+    "list": list,
+    "dict": dict,
+    "set": set,
+    "tuple": tuple,
+    "zip": zip,
+    "abs": abs,
+})
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_cached(source: str, filename: str) -> types.CodeType:
+    """Compile a snippet once per unique source string.
+
+    The common trace workflow re-runs the same code with different inputs,
+    so the (pure-CPU) compile step is memoized on the source text.
+    """
+    return compile(source, filename, "exec")
+
+
+def get_live_trace_explanation(code_str: str, trace_input: str) -> str:
+    """Run the user's code with tracing and ask the explainer persona to narrate it."""
+
+    trace_log: list[str] = []
+    sandbox: dict[str, object] = {"__builtins__": _SAFE_BUILTINS}
     stdout_buffer = io.StringIO()
 
     try:
-        compiled = compile(f"{code_str}\n", "<user_code>", "exec")
-        compiled_trace = compile(trace_input, "<trace_input>", "exec") if trace_input else None
+        code_objects = [_compile_cached(f"{code_str}\n", "<user_code>")]
+        if trace_input:
+            code_objects.append(_compile_cached(trace_input, "<trace_input>"))
         with redirect_stdout(stdout_buffer):
-            sys.settrace(trace_lines)
-            try:
-                exec(compiled, sandbox)
-                if compiled_trace is not None:
-                    exec(compiled_trace, sandbox)
-            finally:
-                sys.settrace(None)
+            _run_traced(code_objects, sandbox, trace_log)
         captured_stdout = stdout_buffer.getvalue()
         trace_report = "\n".join(trace_log)
         if captured_stdout:
             trace_report += f"\n\nstdout:\n{captured_stdout.strip()}"
     except Exception as exc:
-        sys.settrace(None)
         trace_report = f"Trace execution failed: {exc}"
 
-    trace_model = _build_model(TRACE_SYSTEM_INSTRUCTION)
-    chat_session = trace_model.start_chat(history=[])
     prompt = (
         "Source Code:\n\n```python\n"
         f"{code_str}\n"
@@ -636,8 +1205,7 @@ def get_live_trace_explanation(code_str: str, trace_input: str) -> str:
         f"{trace_report}\n"
         "```"
     )
-    response = chat_session.send_message(prompt)
-    return response.text
+    return _generate(TRACE_SYSTEM_INSTRUCTION, prompt)
 
 
 @app.route('/about')
@@ -662,33 +1230,38 @@ def analyze_all():
 
         results: dict[str, object] = {}
 
-        try:
-            results['documentation'] = get_ai_documentation(code)
-        except Exception as exc:
-            results['documentation'] = f"Documentation generation failed: {exc}"
-
-        try:
-            results['audit'] = get_ai_security_audit(code)
-        except Exception as exc:
-            results['audit'] = f"Security audit failed: {exc}"
-
-        results['visualizer'] = generate_visualizer_graph(code)
+        sql_queries = extract_sql_queries(code)
 
-        if trace_input:
-            try:
-                results['trace'] = get_live_trace_explanation(code, trace_input)
-            except Exception as exc:
-                results['trace'] = f"Live trace explanation failed: {exc}"
-        else:
+        # Each Gemini call is an independent, network-bound round trip, so fan
+        # them out on worker threads and overlap the pure-CPU graph build with
+        # the in-flight requests. Wall time collapses to the slowest call.
+        failure_labels = {
+            'documentation': "Documentation generation failed",
+            'audit': "Security audit failed",
+            'trace': "Live trace explanation failed",
+            'database_report': "Database analysis failed",
+        }
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = {
+                'documentation': executor.submit(get_ai_documentation, code),
+                'audit': executor.submit(get_ai_security_audit, code),
+            }
+            if trace_input:
+                futures['trace'] = executor.submit(get_live_trace_explanation, code, trace_input)
+            if sql_queries:
+                futures['database_report'] = executor.submit(get_ai_database_report, sql_queries)
+
+            results['visualizer'] = generate_visualizer_graph(code)
+
+            for section, future in futures.items():
+                try:
+                    results[section] = future.result()
+                except Exception as exc:
+                    results[section] = f"{failure_labels[section]}: {exc}"
+
+        if not trace_input:
             results['trace'] = "Please provide a sample input to run the Live Trace."
-
-        sql_queries = extract_sql_queries(code)
-        if sql_queries:
-            try:
-                results['database_report'] = get_ai_database_report(sql_queries)
-            except Exception as exc:
-                results['database_report'] = f"Database analysis failed: {exc}"
-        else:
+        if not sql_queries:
             results['database_report'] = "No SQL queries detected in the provided code."
 
         return jsonify(results)
@@ -726,29 +1299,59 @@ def upload_zip_endpoint():
             combined_sections.append(f"# File: {rel_path}\n{source}\n")
         combined_code = "\n".join(combined_sections)
 
-        project_graph = build_project_call_graph(python_files)
-
-        try:
-            project_summary = get_ai_project_overview(combined_code)
-        except Exception as exc:
-            project_summary = f"Project overview generation failed: {exc}"
-
-        try:
-            project_security = get_ai_security_audit(combined_code)
-        except Exception as exc:
-            project_security = f"Project security audit failed: {exc}"
-
+        # One parallel pass produces definitions, call sites, and SQL for
+        # every file; the graph builder and DBA report both consume it.
+        analyses = _analyze_project_files(python_files)
         all_sql_queries: list[str] = []
-        for _rel, source in python_files:
-            all_sql_queries.extend(extract_sql_queries(source))
+        for analysis in analyses:
+            all_sql_queries.extend(analysis["sql"])
+
+        # Large projects can opt into the Batch API: half the cost, higher
+        # rate limits, asynchronous completion. Only the LLM work is
+        # deferred; the call graph is still computed and returned inline.
+        if request.args.get('async') == '1':
+            project_graph = build_project_call_graph(python_files, analyses)
+            project_graph.setdefault('metadata', {})['sql_queries'] = len(all_sql_queries)
+            job_name = _submit_project_batch(temp_dir, combined_code, all_sql_queries)
+            pending = ["project_summary", "project_security"]
+            if all_sql_queries:
+                pending.append("database_report")
+            return jsonify({
+                "batch_job": job_name,
+                "pending": pending,
+                "visualizer": project_graph,
+                "file_count": len(python_files),
+            }), 202
+
+        # Overlap the three project-wide Gemini calls with each other and with
+        # the CPU-bound call-graph construction on the request thread.
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            summary_future = executor.submit(get_ai_project_overview, combined_code)
+            security_future = executor.submit(get_ai_security_audit, combined_code)
+            sql_future = (
+                executor.submit(get_ai_database_report, all_sql_queries)
+                if all_sql_queries else None
+            )
+
+            project_graph = build_project_call_graph(python_files, analyses)
 
-        if all_sql_queries:
             try:
-                sql_report = get_ai_database_report(all_sql_queries)
+                project_summary = summary_future.result()
             except Exception as exc:
-                sql_report = f"Database analysis failed: {exc}"
-        else:
-            sql_report = "No SQL queries detected across the uploaded project."
+                project_summary = f"Project overview generation failed: {exc}"
+
+            try:
+                project_security = security_future.result()
+            except Exception as exc:
+                project_security = f"Project security audit failed: {exc}"
+
+            if sql_future is not None:
+                try:
+                    sql_report = sql_future.result()
+                except Exception as exc:
+                    sql_report = f"Database analysis failed: {exc}"
+            else:
+                sql_report = "No SQL queries detected across the uploaded project."
 
         project_graph.setdefault('metadata', {})['sql_queries'] = len(all_sql_queries)
 
@@ -771,6 +1374,30 @@ def upload_zip_endpoint():
         shutil.rmtree(temp_dir, ignore_errors=True)
 
 
+@app.route('/batch-status/<path:job_name>')
+def batch_status(job_name: str):
+    """Poll a queued batch analysis job and surface results once complete."""
+    try:
+        job = _CLIENT.batches.get(name=job_name)
+        state = getattr(job.state, 'name', str(job.state))
+        payload: dict[str, object] = {"state": state}
+        if state == 'JOB_STATE_SUCCEEDED':
+            result_bytes = _CLIENT.files.download(file=job.dest.file_name)
+            results: dict[str, str] = {}
+            for line in result_bytes.decode('utf-8').splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                results[entry.get('key', '')] = _extract_batch_text(entry.get('response') or {})
+            payload['results'] = results
+        elif state == 'JOB_STATE_FAILED':
+            payload['error'] = str(getattr(job, 'error', 'Batch job failed.'))
+        return jsonify(payload)
+    except Exception as exc:
+        print(f"Batch status error: {exc}")
+        return jsonify({"error": "Failed to fetch batch job status."}), 500
+
+
 @app.route('/refactor-code', methods=['POST'])
 def refactor_code():
     """Leverage the refactor persona to patch reported vulnerabilities."""
@@ -829,58 +1456,346 @@ def live_metrics():
         code = (payload.get('code') or '').strip()
         if not code:
             return jsonify({"error": "No code provided"}), 400
-        return jsonify(calculate_code_metrics(code))
+        etag = hashlib.blake2b(code.encode('utf-8'), digest_size=12).hexdigest()
+        # Repeat submissions (autosaves, focus events) whose result the
+        # client already holds cost neither a computation nor a JSON body.
+        if request.headers.get('If-None-Match') == etag:
+            return '', 304
+        response = jsonify(calculate_code_metrics(code))
+        response.headers['ETag'] = etag
+        return response
     except Exception as exc:
         print(f"Live metrics error: {exc}")
         return jsonify({"error": "Failed to calculate metrics."}), 500
 
 
+# The live-metrics endpoint fires on every editor change, and identical
+# payloads are common (autosaves, focus events, undo back to a prior
+# state). Memoizing the finished metrics dict on a digest of the source
+# turns those repeats into a hash plus a dict lookup instead of three
+# radon passes.
+# One multiline pattern classifies every line by its first non-blank
+# character, so loc and comment counts come from a single C-level scan of
+# the buffer instead of materializing splitlines() and sweeping it twice.
+_LINE_SCAN_RE = re.compile(r'^[ \t]*(\S?)', re.MULTILINE)
+
+# Optional accelerator: with numba installed the fallback counter runs as a
+# JIT-compiled byte loop over the raw buffer instead of the regex engine.
+# Only worth it for large pastes; the regex path remains the default.
+try:
+    import numpy as _np
+except ImportError:
+    _np = None
+
+try:
+    import numba as _numba
+except ImportError:
+    _numba = None
+
+if _numba is not None and _np is not None:
+    @_numba.njit(cache=True)
+    def _count_loc_comments_jit(buf):  # pragma: no cover - needs numba
+        loc = 0
+        comments = 0
+        seen = False
+        is_comment = False
+        for byte in buf:
+            if byte == 10:  # newline
+                if seen:
+                    loc += 1
+                if is_comment:
+                    comments += 1
+                seen = False
+                is_comment = False
+            elif byte == 35 and not seen:  # leading '#'
+                is_comment = True
+                seen = True
+            elif byte > 32:
+                seen = True
+        if seen:
+            loc += 1
+        if is_comment:
+            comments += 1
+        return loc, comments
+else:
+    _count_loc_comments_jit = None
+
+
+def _count_loc_comments(code_str: str) -> tuple[int, int]:
+    """Count non-blank lines and comment lines in one pass."""
+    if _count_loc_comments_jit is not None:
+        buf = _np.frombuffer(code_str.encode('utf-8'), dtype=_np.uint8)
+        loc, comments = _count_loc_comments_jit(buf)
+        return int(loc), int(comments)
+    loc = 0
+    comments = 0
+    for match in _LINE_SCAN_RE.finditer(code_str):
+        first_char = match.group(1)
+        if first_char:
+            loc += 1
+            if first_char == '#':
+                comments += 1
+    return loc, comments
+
+
+# Canonical all-zero result, shared read-only; callers that need a mutable
+# dict copy it, so the five-entry literal is built once instead of per call.
+_ZERO_METRICS = types.MappingProxyType({
+    "cyclomatic_complexity_avg": 0.0,
+    "cyclomatic_complexity_max": 0.0,
+    "maintainability_index": 0.0,
+    "loc": 0,
+    "comment_lines": 0,
+})
+
+_METRICS_CACHE_MAX = 256
+_metrics_cache: OrderedDict[bytes, dict[str, float | int]] = OrderedDict()
+_metrics_cache_lock = threading.Lock()
+
+# Complexity results per top-level block, keyed by a digest of the block's
+# source. Live editing touches one region at a time, so unchanged functions
+# and classes skip radon's visitor entirely and re-analysis cost tracks the
+# size of the edit rather than the file. Complexity is a pure function of
+# the block source, so one global cache serves every session.
+_CC_BLOCK_CACHE_MAX = 1024
+_cc_block_cache: OrderedDict[bytes, tuple[int, ...]] = OrderedDict()
+_cc_block_cache_lock = threading.Lock()
+
+
+def _block_complexities(code_str: str, tree: ast.Module, visitor_cls):
+    """Yield per-block complexities, reusing digests of unchanged blocks.
+
+    Module-level defs can sit inside compound statements (a def under
+    ``try:`` import fallbacks or ``if`` platform guards), so enumeration
+    descends through statement bodies rather than reading only tree.body;
+    defs nested inside another def or class stay with their enclosing block.
+    """
+    stack = list(tree.body)
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            # 'handlers' and 'cases' hold ExceptHandler/match_case nodes,
+            # which fall back through here and contribute their own 'body'.
+            for field in ('body', 'orelse', 'finalbody', 'handlers', 'cases'):
+                stack.extend(getattr(node, field, ()))
+            continue
+        segment = ast.get_source_segment(code_str, node)
+        if segment is None:
+            continue
+        key = hashlib.blake2b(segment.encode('utf-8'), digest_size=16).digest()
+        with _cc_block_cache_lock:
+            cached = _cc_block_cache.get(key)
+            if cached is not None:
+                _cc_block_cache.move_to_end(key)
+        if cached is None:
+            # Wrap the node we already hold instead of re-parsing the segment
+            # text; cc_visit would run ast.parse again on every cache miss.
+            try:
+                wrapper = ast.Module(body=[node], type_ignores=[])
+                cached = tuple(
+                    block.complexity for block in visitor_cls.from_ast(wrapper).blocks
+                )
+            except Exception:
+                cached = ()
+            with _cc_block_cache_lock:
+                _cc_block_cache[key] = cached
+                while len(_cc_block_cache) > _CC_BLOCK_CACHE_MAX:
+                    _cc_block_cache.popitem(last=False)
+        yield from cached
+
+
+def _raw_stats_from_tokens(src_bytes: bytes):
+    """Rebuild radon's raw metrics from a single tokenize pass.
+
+    radon's raw_analyze re-reads the source through its own tokenizer; this
+    walks the already-encoded buffer once and reproduces the Module fields
+    the metrics path consumes. String statements follow radon's rules: a
+    one-line docstring counts as a single comment, a multiline one counts
+    its non-blank lines as multi and its blank lines as blank.
+    """
+    from radon.raw import Module
+
+    comments = single_comments = blank = lloc = multi = 0
+    pending_string = None
+    semicolon_pending = False
+    for tok in tokenize.tokenize(io.BytesIO(src_bytes).readline):
+        tok_type = tok.type
+        if pending_string is not None:
+            if tok_type == tokenize.NEWLINE:
+                span, blank_inside = pending_string
+                if span == 1:
+                    single_comments += 1
+                else:
+                    multi += span - blank_inside
+            pending_string = None
+        if semicolon_pending:
+            # A separator followed by another statement adds a logical line;
+            # a trailing semicolon before the newline does not.
+            if tok_type not in (tokenize.NEWLINE, tokenize.NL, tokenize.COMMENT):
+                lloc += 1
+            semicolon_pending = False
+        if tok_type == tokenize.COMMENT:
+            comments += 1
+            if not tok.line[:tok.start[1]].strip():
+                single_comments += 1
+        elif tok_type == tokenize.NEWLINE:
+            lloc += 1
+        elif tok_type == tokenize.NL:
+            if not tok.line.strip():
+                blank += 1
+        elif tok_type == tokenize.STRING:
+            span = tok.end[0] - tok.start[0] + 1
+            blank_inside = 0
+            if span > 1:
+                # Blank lines inside any multiline string count as blank,
+                # docstring or not.
+                blank_inside = sum(
+                    1 for line in tok.string.splitlines() if not line.strip()
+                )
+                blank += blank_inside
+            if not tok.line[:tok.start[1]].strip():
+                pending_string = (span, blank_inside)
+        elif tok_type == tokenize.OP and tok.string == ';':
+            semicolon_pending = True
+    loc = src_bytes.count(b'\n') + (0 if src_bytes.endswith(b'\n') or not src_bytes else 1)
+    sloc = loc - blank - multi - single_comments
+    return Module(loc, lloc, sloc, comments, multi, blank, single_comments)
+
+
 def calculate_code_metrics(code_str: str) -> dict[str, float | int]:
     """Compute quick structural metrics to power the Live Metrics panel."""
-    metrics: dict[str, float | int] = {
-        "cyclomatic_complexity_avg": 0.0,
-        "cyclomatic_complexity_max": 0.0,
-        "maintainability_index": 0.0,
-        "loc": 0,
-        "comment_lines": 0,
-    }
-
     if not code_str or not code_str.strip():
-        return metrics
+        return dict(_ZERO_METRICS)
 
-    try:
-        blocks = cc_visit(code_str)
-        complexities = [block.complexity for block in blocks]
-        if complexities:
-            metrics["cyclomatic_complexity_avg"] = sum(complexities) / len(complexities)
-            metrics["cyclomatic_complexity_max"] = max(complexities)
-    except Exception:
-        pass
+    metrics: dict[str, float | int] = dict(_ZERO_METRICS)
 
+    # Snippets this small (the first few keystrokes of a session) carry no
+    # meaningful complexity or maintainability signal, so skip radon and the
+    # cache machinery and answer from the line counter alone.
+    if len(code_str) < 32 or code_str.count('\n') < 2:
+        metrics["loc"], metrics["comment_lines"] = _count_loc_comments(code_str)
+        return metrics
+
+    # Encode once; the digest, the parser and the tokenizer all share the
+    # same buffer instead of each re-encoding the string.
+    src_bytes = code_str.encode('utf-8')
+    digest = hashlib.blake2b(src_bytes, digest_size=16).digest()
+    with _metrics_cache_lock:
+        cached = _metrics_cache.get(digest)
+        if cached is not None:
+            _metrics_cache.move_to_end(digest)
+            # Shallow copy so callers cannot mutate the cached entry.
+            return dict(cached)
+
+    from radon.metrics import h_visit_ast, mi_compute
+    from radon.visitors import ComplexityVisitor
+
+    # Parse and tokenize once, then feed every metric from the shared
+    # results. cc_visit/mi_visit/raw_analyze would each re-read the source
+    # from scratch, tripling the parsing cost of a single submission.
+    # Narrow except clauses: the live editor submits malformed code on most
+    # keystrokes, and a failed parse is the expected case here, not a bug to
+    # be masked along with everything else.
     try:
-        mi_score = mi_visit(code_str, False)
-        if isinstance(mi_score, (int, float)):
-            metrics["maintainability_index"] = max(0.0, min(100.0, mi_score))
-    except Exception:
-        pass
+        tree = ast.parse(src_bytes)
+    except (SyntaxError, ValueError, RecursionError):
+        tree = None
 
     try:
-        raw_stats = raw_analyze(code_str)
+        raw_stats = _raw_stats_from_tokens(src_bytes)
         metrics["loc"] = raw_stats.loc
         metrics["comment_lines"] = raw_stats.comments + raw_stats.multi
-    except Exception:
-        lines = code_str.splitlines()
-        metrics["loc"] = sum(1 for line in lines if line.strip())
-        metrics["comment_lines"] = sum(1 for line in lines if line.strip().startswith('#'))
-
-    return metrics
+    except (SyntaxError, ValueError, tokenize.TokenError):
+        raw_stats = None
+        metrics["loc"], metrics["comment_lines"] = _count_loc_comments(code_str)
+
+    if tree is not None:
+        # Single fused pass: running total and max over the generator, so the
+        # complexities are never materialized or walked more than once. Big
+        # files (gated on top-level statement count) drain the generator into
+        # a contiguous int32 array instead, where numpy's C reductions beat
+        # the bytecode loop; small inputs stay on the loop, which wins there.
+        total = highest = count = 0
+        try:
+            if _np is not None and len(tree.body) >= 32:
+                values = _np.fromiter(
+                    _block_complexities(code_str, tree, ComplexityVisitor),
+                    dtype=_np.int32,
+                )
+                count = int(values.size)
+                if count:
+                    total = int(values.sum())
+                    highest = int(values.max())
+            else:
+                for complexity in _block_complexities(code_str, tree, ComplexityVisitor):
+                    total += complexity
+                    if complexity > highest:
+                        highest = complexity
+                    count += 1
+            if count:
+                metrics["cyclomatic_complexity_avg"] = total / count
+                metrics["cyclomatic_complexity_max"] = highest
+        except (TypeError, ValueError, RecursionError):
+            pass
+
+        if raw_stats is not None:
+            try:
+                comments_pct = (
+                    raw_stats.comments / float(raw_stats.sloc) * 100
+                    if raw_stats.sloc else 0
+                )
+                # The block totals from the pass above stand in for a second
+                # ComplexityVisitor traversal; MI is a display heuristic and
+                # tracks the same signal.
+                mi_score = mi_compute(
+                    h_visit_ast(tree).total.volume,
+                    total,
+                    raw_stats.lloc,
+                    comments_pct,
+                )
+                # A non-numeric score raises TypeError on the comparison and
+                # lands in the except below, so the isinstance probe is gone.
+                metrics["maintainability_index"] = (
+                    0.0 if mi_score < 0 else 100.0 if mi_score > 100 else float(mi_score)
+                )
+            except (TypeError, ValueError, ZeroDivisionError, RecursionError):
+                pass
+
+    with _metrics_cache_lock:
+        _metrics_cache[digest] = metrics
+        while len(_metrics_cache) > _METRICS_CACHE_MAX:
+            _metrics_cache.popitem(last=False)
+
+    return dict(metrics)
+
+
+# Pre-warm off-thread at boot: the first real submission otherwise pays for
+# radon's import and, when installed, numba's JIT compile.
+def _prewarm_metrics() -> None:
+    """Exercise both metric paths once so their lazy costs land at boot."""
+    # Large enough to dodge the tiny-input fast path so the radon stack
+    # actually loads.
+    calculate_code_metrics("def _warmup(value):\n    return value\n\n\n_warmup(0)\n")
+    # The main path no longer touches the fallback counter, so trigger the
+    # JIT compile on it directly.
+    _count_loc_comments("# warm\npass\n")
+
+
+threading.Thread(target=_prewarm_metrics, daemon=True, name='metrics-prewarm').start()
 
 # --- CORS headers to allow requests ---
+# Built once; the hook runs on every response, so a single extend beats
+# three separate headers.add calls per request.
+_CORS_HEADERS = (
+    ('Access-Control-Allow-Origin', '*'),
+    ('Access-Control-Allow-Headers', 'Content-Type'),
+    ('Access-Control-Allow-Methods', 'GET,POST'),
+)
+
+
 @app.after_request
 def after_request(response):
-    response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
-    response.headers.add('Access-Control-Allow-Methods', 'GET,POST')
+    response.headers.extend(_CORS_HEADERS)
     return response
 
 # --- Authentication Routes ---
@@ -930,6 +1845,20 @@ def settings():
     return render_template('settings.html', api_key=api_key, temperature=temperature)
 
 # --- Main Entrypoint ---
+def serve() -> None:
+    """Run the app under waitress, a threaded production WSGI server.
+
+    The Werkzeug dev server is single-threaded with the reloader watching
+    the filesystem, so concurrent editor sessions serialize behind one
+    worker. Set FLASK_DEBUG=1 to get the dev server back for debugging.
+    """
+    if os.getenv('FLASK_DEBUG'):
+        app.run(host='0.0.0.0', port=8080, debug=True)
+        return
+    from waitress import serve as waitress_serve
+    waitress_serve(app, host='0.0.0.0', port=8080, threads=8)
+
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8080, debug=True)
+    serve()
 
@@ -478,6 +478,10 @@ document.addEventListener('DOMContentLoaded', () => {
         updateVitalStats(metrics, sourceCode);
     };
 
+    // Echo the last ETag back so unchanged submissions (autosaves, focus
+    // events) come back as a bodyless 304 and the panel keeps its numbers.
+    let lastMetricsEtag = null;
+
     const requestLiveMetrics = async () => {
         if (!codeInput) return;
         const sourceCode = codeInput.value || '';
@@ -486,17 +490,25 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         try {
+            const headers = {
+                'Content-Type': 'application/json',
+            };
+            if (lastMetricsEtag) {
+                headers['If-None-Match'] = lastMetricsEtag;
+            }
             const response = await fetch('/live-metrics', {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
+                headers,
                 body: JSON.stringify({ code: sourceCode }),
             });
+            if (response.status === 304) {
+                return;
+            }
             const payload = await response.json();
             if (!response.ok) {
                 throw new Error(payload.error || 'Unable to fetch live metrics.');
             }
+            lastMetricsEtag = response.headers.get('ETag');
             refreshLiveMetrics(payload, sourceCode);
         } catch (error) {
             console.error('Live metrics error:', error);
@@ -511,6 +523,51 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // Zips past this size opt into the Batch API on upload: half-price LLM
+    // calls at higher rate limits, with the reports filled in by polling.
+    const BATCH_UPLOAD_BYTES = 1024 * 1024;
+    const BATCH_POLL_MS = 5000;
+    const BATCH_POLL_LIMIT = 120;
+
+    const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+    const pollBatchResults = async (jobName, pending) => {
+        for (let attempt = 1; attempt <= BATCH_POLL_LIMIT; attempt += 1) {
+            await sleep(BATCH_POLL_MS);
+            let payload;
+            try {
+                const response = await fetch(`/batch-status/${jobName}`);
+                payload = await response.json();
+                if (!response.ok) {
+                    throw new Error(payload.error || 'Batch status check failed.');
+                }
+            } catch (error) {
+                // Transient; keep polling until the attempt budget runs out.
+                console.error('Batch status error:', error);
+                continue;
+            }
+            const state = payload.state || '';
+            if (state === 'JOB_STATE_SUCCEEDED') {
+                const results = payload.results || {};
+                renderMarkdown(docOutput, results.project_summary, 'No project summary available.');
+                renderMarkdown(auditOutput, results.project_security, 'No project security report available.');
+                if (pending.includes('database_report')) {
+                    renderMarkdown(databaseOutput, results.database_report, 'No database report available.');
+                } else {
+                    renderMarkdown(databaseOutput, 'No SQL queries detected across the uploaded project.', '');
+                }
+                setUploadStatus('Batch analysis complete.');
+                return;
+            }
+            if (state === 'JOB_STATE_FAILED' || state === 'JOB_STATE_CANCELLED' || state === 'JOB_STATE_EXPIRED') {
+                setUploadStatus(payload.error || 'Batch analysis failed.');
+                return;
+            }
+            setUploadStatus(`Batch analysis in progress (${state || 'running'})...`);
+        }
+        setUploadStatus('Batch analysis is taking longer than expected; retry the upload later.');
+    };
+
     const handleZipUpload = async () => {
         if (!projectZipInput || !uploadZipButton) {
             return;
@@ -528,7 +585,8 @@ document.addEventListener('DOMContentLoaded', () => {
         uploadZipButton.textContent = 'Mapping project...';
 
         try {
-            const response = await fetch('/upload-zip', {
+            const useBatch = file.size > BATCH_UPLOAD_BYTES;
+            const response = await fetch(useBatch ? '/upload-zip?async=1' : '/upload-zip', {
                 method: 'POST',
                 body: formData,
             });
@@ -538,6 +596,21 @@ document.addEventListener('DOMContentLoaded', () => {
                 throw new Error(message);
             }
 
+            if (response.status === 202) {
+                // The call graph comes back inline; the persona reports
+                // arrive via the batch job, so show the map now and poll.
+                await renderVisualizer(payload.visualizer);
+                renderMarkdown(docOutput, 'Project summary is queued as a batch job...', '');
+                renderMarkdown(auditOutput, 'Security audit is queued as a batch job...', '');
+                renderMarkdown(databaseOutput, 'Database report is queued as a batch job...', '');
+                traceOutput.textContent = 'Project uploads do not run live trace sessions.';
+                lastSubmittedCode = '';
+                setUploadStatus(`Mapped ${payload.file_count} Python files; batch analysis queued.`);
+                setActiveTab('visualizer');
+                pollBatchResults(payload.batch_job, payload.pending || []);
+                return;
+            }
+
             renderMarkdown(docOutput, payload.project_summary, 'No project summary available.');
             renderMarkdown(auditOutput, payload.project_security, 'No project security report available.');
             await renderVisualizer(payload.visualizer);